@@ -7,8 +7,10 @@ import sqlite3
 import json
 from dotenv import load_dotenv
 
-from services.llm import ask_clarifying_questions, generate_user_stories, style_check_stories
+from services.llm import ask_clarifying_questions, generate_user_stories, revise_user_stories, style_check_stories
 from services.export import export_markdown, export_csv
+from services import router
+from services.speculative import SpeculativeDraft
 
 load_dotenv()
 
@@ -75,6 +77,27 @@ def get_last_runs(limit=5):
         conn.close()
 
 
+def show_route(stage):
+    decision = st.session_state.routes.get(stage)
+    if not decision:
+        return
+    with st.expander(f"🧭 Model routing: {decision['model']}"):
+        st.write(f"**Tier:** {decision['tier']} — {decision['reason']}")
+        st.write(
+            f"**Estimated tokens:** {decision['prompt_tokens']} prompt + "
+            f"{decision['output_tokens']} output (load {decision['load']}, domain {decision['domain']})"
+        )
+        if decision.get("skipped"):
+            st.write("**Skipped tiers:**")
+            for reason in decision["skipped"]:
+                st.write(f"- {reason}")
+        if decision.get("attempts"):
+            st.write("**Attempts:**")
+            st.json(decision["attempts"])
+        st.write("**History for this stage:**")
+        st.json(router.model_stats(stage))
+
+
 st.set_page_config(page_title="PM Agent", page_icon="🧩", layout="wide")
 st.title("🧩 Product Manager Agent")
 
@@ -92,6 +115,10 @@ if "stories" not in st.session_state:
     st.session_state.stories = None
 if "last_error" not in st.session_state:
     st.session_state.last_error = None
+if "routes" not in st.session_state:
+    st.session_state.routes = {}
+if "speculative" not in st.session_state:
+    st.session_state.speculative = None
 
 tab1, tab2, tab3 = st.tabs(["BRD → Questions", "Answer Questions", "Generate User Stories"])
 
@@ -103,7 +130,18 @@ with tab1:
         ["generic", "Logistics", "Fintech", "Healthcare"],
         index=0
     )
+
+    # A draft started under another domain profile no longer applies.
+    if st.session_state.speculative and st.session_state.speculative.domain != st.session_state.domain:
+        st.session_state.speculative.cancel()
+        st.session_state.speculative = None
     
+    speculate = st.checkbox(
+        "⚡ Speculative story drafting",
+        value=os.getenv("SPECULATIVE_STORIES") == "1",
+        help="Draft stories from assumed answers while you answer the questions."
+    )
+
     brd_text = st.text_area("Paste BRD", height=250)
 
     if st.button("Generate 8 Clarifying Questions"):
@@ -113,17 +151,32 @@ with tab1:
             st.session_state.brd_text = brd_text
             with st.spinner("Generating questions..."):
                 try:
-                    output = ask_clarifying_questions(brd_text, st.session_state.domain)
+                    output = ask_clarifying_questions(brd_text, st.session_state.domain, st.session_state.routes)
                     st.session_state.questions = output["questions"]
                     st.session_state.clarify_meta = output["meta"]
                     st.session_state.last_error = None
                     st.success("✅ Generated 8 questions successfully!")
+
+                    if st.session_state.speculative:
+                        st.session_state.speculative.cancel()
+                        st.session_state.speculative = None
+                    if speculate:
+                        st.session_state.speculative = SpeculativeDraft(
+                            brd_text,
+                            st.session_state.questions,
+                            st.session_state.clarify_meta,
+                            st.session_state.domain,
+                            generate_user_stories,
+                            revise_user_stories
+                        )
                 except Exception as e:
                     st.session_state.last_error = str(e)
                     st.error(f"❌ Failed: {e}")
                     with st.expander("📋 Debug Info"):
                         st.write(f"**Error Details:**\n{st.session_state.last_error}")
 
+    show_route("clarify")
+
     if st.session_state.questions:
         st.subheader("Generated Questions (JSON)")
         st.json(st.session_state.questions)
@@ -158,14 +211,33 @@ with tab2:
     if not st.session_state.questions:
         st.info("Generate questions first.")
     else:
+        spec = st.session_state.speculative
+        if spec:
+            st.caption("⚡ Speculative drafting is on: blank answers use the assumption shown in the box.")
+
         answers = {}
         for q in st.session_state.questions:
-            answers[q["id"]] = st.text_area(f"{q['id']} — {q['text']}", height=80)
+            answers[q["id"]] = st.text_area(
+                f"{q['id']} — {q['text']}",
+                height=80,
+                placeholder=spec.assumed.get(q["id"], "") if spec else ""
+            )
 
         if st.button("Save Answers"):
-            st.session_state.answers = answers
+            if spec:
+                spec.resolve(answers)
+                # Store what the stories are actually built from, assumptions included.
+                st.session_state.answers = spec.answers
+            else:
+                st.session_state.answers = answers
             st.success("Answers saved!")
 
+            if spec:
+                if spec.mode == "speculative":
+                    st.info("⚡ Answers match the speculative draft's assumptions.")
+                else:
+                    st.info(f"⚡ {len(spec.changed)} answer(s) differ from assumptions; {spec.mode} draft in background.")
+
 with tab3:
     st.header("Step 3: Generate User Stories")
 
@@ -175,11 +247,28 @@ with tab3:
         if st.button("Generate User Stories JSON"):
             with st.spinner("Generating stories..."):
                 try:
-                    result = generate_user_stories(
-                        st.session_state.brd_text,
-                        st.session_state.answers,
-                        st.session_state.domain
-                    )
+                    result = None
+                    st.session_state.routes.pop("stories", None)
+                    st.session_state.routes.pop("revise", None)
+                    # The speculative result is served once; later clicks regenerate for real.
+                    spec = st.session_state.speculative
+                    st.session_state.speculative = None
+                    if spec and spec.final:
+                        try:
+                            result = spec.final.result()
+                            st.session_state.routes.update(spec.final_routes)
+                            st.caption(f"⚡ Served from {spec.mode} speculative draft")
+                        except Exception as spec_err:
+                            print(f"[SPECULATIVE] Draft unusable, generating directly: {spec_err}")
+                    if spec:
+                        spec.cancel()
+                    if result is None:
+                        result = generate_user_stories(
+                            st.session_state.brd_text,
+                            st.session_state.answers,
+                            st.session_state.domain,
+                            st.session_state.routes
+                        )
                     st.session_state.stories = result
                     st.session_state.last_error = None
                     
@@ -240,4 +329,7 @@ with tab3:
                     with st.expander("📋 Debug Info"):
                         st.write(f"**Error Details:**\n{st.session_state.last_error}")
 
+        show_route("stories")
+        show_route("revise")
+
 # Database already initialized above
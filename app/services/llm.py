@@ -1,11 +1,14 @@
 import os
 import json
-from typing import Dict, Any
+import time
+import threading
+from typing import Dict, Any, Optional, Tuple
 from dotenv import load_dotenv
 
 from langchain_openai import ChatOpenAI
 from langchain_core.messages import HumanMessage
 from .schema import ClarifyOutput, StoryOutput
+from . import router
 
 load_dotenv()
 
@@ -17,8 +20,9 @@ if not OPENROUTER_KEY:
 os.environ["OPENAI_API_KEY"] = OPENROUTER_KEY
 os.environ["OPENAI_BASE_URL"] = "https://openrouter.ai/api/v1"
 
-CLARIFY_MODEL = os.getenv("CLARIFY_MODEL", "meta-llama/llama-3.1-8b-instruct")
-STORY_MODEL   = os.getenv("STORY_MODEL", "meta-llama/llama-3.1-8b-instruct")
+# Setting either of these pins the stage to one model and bypasses the router.
+CLARIFY_MODEL = os.getenv("CLARIFY_MODEL")
+STORY_MODEL   = os.getenv("STORY_MODEL")
 
 
 def _load_prompt(filename: str) -> str:
@@ -40,69 +44,138 @@ def _call_llm(model_name: str, system: str, prompt: str) -> str:
     return response.content
 
 
+def _routed_call(decision: Dict[str, Any], prompt: str, validate) -> Tuple[str, Any, Optional[Exception]]:
+    start = time.perf_counter()
+    raw, data, error = "", None, None
+    success = False
+    try:
+        # Timeouts and provider errors propagate, but are still recorded against the model.
+        raw = _call_llm(decision["model"], SYSTEM_PM, prompt).strip()
+        try:
+            data = json.loads(raw)
+            validate(data)
+            success = True
+        except Exception as e:
+            data, error = None, e
+    finally:
+        latency = time.perf_counter() - start
+        router.record_call(decision["stage"], decision["model"], decision["prompt_tokens"], latency, success)
+        decision.setdefault("attempts", []).append(
+            {"model": decision["model"], "latency_s": round(latency, 2), "success": success}
+        )
+    return raw, data, error
+
+
+def _route(stage: str, prompt: str, domain: str, pinned: Optional[str], routes: Optional[Dict[str, Any]],
+           content: str, echoed_tokens: int = 0) -> Dict[str, Any]:
+    decision = router.choose_model(stage, prompt, domain, pinned=pinned, echoed_tokens=echoed_tokens,
+                                   content_tokens=router.estimate_tokens(content))
+    if routes is not None:
+        routes[stage] = decision
+    print(f"[ROUTER] {stage}: {decision['model']} ({decision['reason']})")
+    return decision
+
+
+def _escalate(decision: Dict[str, Any], prompt: str, routes: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    retry = router.escalate(decision, prompt)
+    if retry is not decision:
+        retry["attempts"] = decision.get("attempts", [])
+        retry["reason"] = f"escalated after failed validation; {retry['reason']}"
+        if routes is not None:
+            routes[retry["stage"]] = retry
+        print(f"[ROUTER] {retry['stage']}: retrying on {retry['model']}")
+    return retry
+
+
+def _print_raw(label: str, attempt: int, raw: str, preview: Optional[int]):
+    shown = f"{raw[:preview]}..." if preview and len(raw) > preview else raw
+    print(f"[{label}] Raw response (attempt {attempt}):\n{shown}")
+
+
+class GenerationCancelled(RuntimeError):
+    pass
+
+
+def _check_cancel(label: str, cancel: Optional[threading.Event]):
+    if cancel is not None and cancel.is_set():
+        print(f"[{label}] Cancelled before LLM call.")
+        raise GenerationCancelled(f"{label} generation cancelled")
+
+
+def _generate_json(stage: str, label: str, what: str, prompt: str, content: str, domain: str,
+                   pinned: Optional[str], schema, routes: Optional[Dict[str, Any]], echoed_tokens: int = 0,
+                   preview: Optional[int] = None, cancel: Optional[threading.Event] = None) -> Dict[str, Any]:
+    decision = _route(stage, prompt, domain, pinned, routes, content, echoed_tokens)
+    _check_cancel(label, cancel)
+    raw, data, err = _routed_call(decision, prompt, schema.model_validate)
+    _print_raw(label, 1, raw, preview)
+    if err is None:
+        return data
+
+    print(f"[{label}] First attempt failed: {err}. Retrying with stricter prompt.")
+    retry_prompt = prompt + "\n\nOutput ONLY valid JSON. No markdown. No text before or after JSON. Start with {."
+    _check_cancel(label, cancel)
+    decision = _escalate(decision, retry_prompt, routes)
+    raw2, data, retry_err = _routed_call(decision, retry_prompt, schema.model_validate)
+    _print_raw(label, 2, raw2, preview)
+    if retry_err is None:
+        return data
+
+    print(f"[{label}] Validation failed: {retry_err}")
+    raise RuntimeError(f"Failed to parse {what} after 2 attempts:\n{retry_err}")
+
+
 SYSTEM_PM = (
     "You are a pragmatic Product Manager. "
     "Output ONLY valid JSON. No markdown. No explanations. No prose."
 )
 
-def ask_clarifying_questions(brd_text: str, domain: str = "generic"):
+def ask_clarifying_questions(brd_text: str, domain: str = "generic", routes: Optional[Dict[str, Any]] = None):
     prompt = _load_prompt("clarify.txt").replace("{BRD_TEXT}", brd_text)
     
     if domain and domain != "generic":
         domain_hint = f"\nDomain context: This is a {domain} domain project. Adjust questions to focus on {domain}-specific concerns."
         prompt += domain_hint
 
-    raw = _call_llm(CLARIFY_MODEL, SYSTEM_PM, prompt).strip()
-    print(f"[CLARIFY] Raw response (attempt 1):\n{raw}")
-
-    try:
-        data = json.loads(raw)
-        ClarifyOutput.model_validate(data)
-        return data
-    except Exception as e:
-        print(f"[CLARIFY] First attempt failed: {e}. Retrying with stricter prompt.")
-        retry_prompt = prompt + "\n\nOutput ONLY valid JSON. No markdown. No text before or after JSON. Start with {."
-        raw2 = _call_llm(CLARIFY_MODEL, SYSTEM_PM, retry_prompt).strip()
-        print(f"[CLARIFY] Raw response (attempt 2):\n{raw2}")
-        try:
-            data = json.loads(raw2)
-            ClarifyOutput.model_validate(data)
-            return data
-        except Exception as retry_err:
-            print(f"[CLARIFY] Validation failed: {retry_err}")
-            raise RuntimeError(f"Failed to parse clarifying questions after 2 attempts:\n{retry_err}")
+    return _generate_json("clarify", "CLARIFY", "clarifying questions", prompt, brd_text, domain,
+                          CLARIFY_MODEL, ClarifyOutput, routes)
 
 
-def generate_user_stories(brd_text: str, answers_json: Dict[str, Any], domain: str = "generic"):
+def generate_user_stories(brd_text: str, answers_json: Dict[str, Any], domain: str = "generic",
+                          routes: Optional[Dict[str, Any]] = None, cancel: Optional[threading.Event] = None):
+    answers_text = json.dumps(answers_json, ensure_ascii=False)
     prompt = _load_prompt("stories.txt")
     prompt = (
         prompt.replace("{BRD_TEXT}", brd_text)
-        .replace("{ANSWERS_JSON}", json.dumps(answers_json, ensure_ascii=False))
+        .replace("{ANSWERS_JSON}", answers_text)
     )
     
     if domain and domain != "generic":
         domain_hint = f"\nDomain context: This is a {domain} domain project. Ensure stories align with {domain} best practices."
         prompt += domain_hint
 
-    raw = _call_llm(STORY_MODEL, SYSTEM_PM, prompt).strip()
-    print(f"[STORIES] Raw response (attempt 1):\n{raw[:500]}..." if len(raw) > 500 else f"[STORIES] Raw response (attempt 1):\n{raw}")
+    return _generate_json("stories", "STORIES", "user stories", prompt, brd_text + answers_text, domain,
+                          STORY_MODEL, StoryOutput, routes, preview=500, cancel=cancel)
 
-    try:
-        data = json.loads(raw)
-        StoryOutput.model_validate(data)
-        return data
-    except Exception as e:
-        print(f"[STORIES] First attempt failed: {e}. Retrying with stricter prompt.")
-        retry_prompt = prompt + "\n\nOutput ONLY valid JSON. No markdown. No text before or after JSON. Start with {."
-        raw2 = _call_llm(STORY_MODEL, SYSTEM_PM, retry_prompt).strip()
-        print(f"[STORIES] Raw response (attempt 2):\n{raw2[:500]}..." if len(raw2) > 500 else f"[STORIES] Raw response (attempt 2):\n{raw2}")
-        try:
-            data = json.loads(raw2)
-            StoryOutput.model_validate(data)
-            return data
-        except Exception as retry_err:
-            print(f"[STORIES] Validation failed: {retry_err}")
-            raise RuntimeError(f"Failed to parse user stories after 2 attempts:\n{retry_err}")
+
+def revise_user_stories(brd_text: str, draft: Dict[str, Any], changed_answers: Dict[str, Any], domain: str = "generic",
+                        routes: Optional[Dict[str, Any]] = None, cancel: Optional[threading.Event] = None):
+    draft_json = json.dumps(draft, ensure_ascii=False)
+    changed_text = json.dumps(changed_answers, ensure_ascii=False)
+    prompt = _load_prompt("revise.txt")
+    prompt = (
+        prompt.replace("{BRD_TEXT}", brd_text)
+        .replace("{DRAFT_JSON}", draft_json)
+        .replace("{CHANGED_ANSWERS_JSON}", changed_text)
+    )
+
+    if domain and domain != "generic":
+        domain_hint = f"\nDomain context: This is a {domain} domain project. Ensure stories align with {domain} best practices."
+        prompt += domain_hint
+
+    return _generate_json("revise", "REVISE", "revised user stories", prompt, brd_text + changed_text, domain,
+                          STORY_MODEL, StoryOutput, routes,
+                          echoed_tokens=router.estimate_tokens(draft_json), preview=500, cancel=cancel)
 
 
 def style_check_stories(stories_data: Dict[str, Any]) -> Dict[str, Any]:
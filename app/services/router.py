@@ -0,0 +1,195 @@
+import os
+import json
+import sqlite3
+import time
+from typing import Dict, Any, List, Optional
+
+DB_PATH = "pm_agent.db"
+
+# Ordered cheapest → most capable. Override with MODEL_TIERS (JSON list of the same shape).
+DEFAULT_TIERS = [
+    {"name": "small",  "model": "meta-llama/llama-3.1-8b-instruct",  "max_tokens": 3000},
+    {"name": "medium", "model": "meta-llama/llama-3.1-70b-instruct", "max_tokens": 12000},
+    {"name": "large",  "model": "openai/gpt-4o",                      "max_tokens": 128000},
+]
+
+# Regulated domains carry more edge cases, so the BRD-dependent part of the load is weighted up.
+DOMAIN_WEIGHT = {"fintech": 1.5, "healthcare": 1.5, "logistics": 1.0, "generic": 1.0}
+
+MIN_SAMPLES = 5
+MIN_SUCCESS_RATE = 0.7
+MAX_LATENCY_S = float(os.getenv("ROUTER_MAX_LATENCY_S", "30"))
+# Only calls this recent count towards health, so a skipped tier is retried once its failures age out.
+STATS_WINDOW_S = float(os.getenv("ROUTER_STATS_WINDOW_H", "6")) * 3600
+
+
+def _load_tiers() -> List[Dict[str, Any]]:
+    raw = os.getenv("MODEL_TIERS")
+    if not raw:
+        return DEFAULT_TIERS
+    try:
+        tiers = json.loads(raw)
+        if tiers and all({"name", "model", "max_tokens"} <= set(t) for t in tiers):
+            return tiers
+    except json.JSONDecodeError:
+        pass
+    print("[ROUTER] MODEL_TIERS invalid, falling back to defaults")
+    return DEFAULT_TIERS
+
+
+TIERS = _load_tiers()
+
+
+def estimate_tokens(text: str) -> int:
+    # ~4 characters per token for English prose.
+    return max(1, len(text) // 4)
+
+
+# Output every call of a stage produces regardless of BRD size.
+FIXED_OUTPUT_TOKENS = {"clarify": 600, "stories": 1500}
+
+
+def estimate_output_tokens(stage: str, content_tokens: int, echoed_tokens: int = 0) -> int:
+    if stage == "revise":
+        # A revised draft comes back at roughly the size of the draft it was given.
+        return echoed_tokens
+    fixed = FIXED_OUTPUT_TOKENS.get(stage, 0)
+    if stage == "clarify":
+        # 8 short questions plus meta, independent of BRD size.
+        return fixed
+    # Stories grow with the amount of requirement text to cover.
+    return fixed + content_tokens // 2
+
+
+def _connect():
+    conn = sqlite3.connect(DB_PATH, timeout=10.0)
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS model_calls (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        stage TEXT NOT NULL,
+        model TEXT NOT NULL,
+        prompt_tokens INTEGER,
+        latency_s REAL,
+        success INTEGER,
+        created_at REAL
+    )
+    """)
+    return conn
+
+
+def record_call(stage: str, model: str, prompt_tokens: int, latency_s: float, success: bool):
+    conn = _connect()
+    try:
+        conn.execute(
+            "INSERT INTO model_calls (stage, model, prompt_tokens, latency_s, success, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (stage, model, prompt_tokens, latency_s, int(success), time.time())
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def model_stats(stage: str, limit: int = 50) -> Dict[str, Dict[str, Any]]:
+    """Success rate and mean latency per model over the most recent calls for a stage within STATS_WINDOW_S."""
+    conn = _connect()
+    try:
+        cur = conn.cursor()
+        cur.execute("""
+        SELECT model, COUNT(*), AVG(success), AVG(latency_s)
+        FROM (
+            SELECT model, success, latency_s,
+                   ROW_NUMBER() OVER (PARTITION BY model ORDER BY id DESC) AS rn
+            FROM model_calls
+            WHERE stage = ? AND created_at >= ?
+        )
+        WHERE rn <= ?
+        GROUP BY model
+        """, (stage, time.time() - STATS_WINDOW_S, limit))
+        return {
+            model: {"calls": calls, "success_rate": success_rate, "avg_latency_s": avg_latency}
+            for model, calls, success_rate, avg_latency in cur.fetchall()
+        }
+    finally:
+        conn.close()
+
+
+def _health_issue(stats: Optional[Dict[str, Any]]) -> Optional[str]:
+    if not stats or stats["calls"] < MIN_SAMPLES:
+        return None
+    if stats["success_rate"] < MIN_SUCCESS_RATE:
+        return f"success rate {stats['success_rate']:.0%} below {MIN_SUCCESS_RATE:.0%}"
+    if stats["avg_latency_s"] > MAX_LATENCY_S:
+        return f"avg latency {stats['avg_latency_s']:.1f}s above {MAX_LATENCY_S:.0f}s"
+    return None
+
+
+def choose_model(stage: str, prompt: str, domain: str = "generic",
+                 pinned: Optional[str] = None, min_tier: int = 0, echoed_tokens: int = 0,
+                 content_tokens: Optional[int] = None) -> Dict[str, Any]:
+    """Pick the cheapest tier that fits the estimated load and has a healthy track record.
+
+    content_tokens is the size of the BRD and answers inside the prompt (defaults to the
+    whole prompt); only that part drives output growth and the domain weight.
+    echoed_tokens is prompt content the model copies back (a draft being revised); it is
+    counted once, as output, so revising is no heavier than generating.
+    """
+    prompt_tokens = estimate_tokens(prompt)
+    if content_tokens is None:
+        content_tokens = prompt_tokens
+    output_tokens = estimate_output_tokens(stage, content_tokens, echoed_tokens)
+    weight = DOMAIN_WEIGHT.get((domain or "generic").lower(), 1.0)
+    fixed = FIXED_OUTPUT_TOKENS.get(stage, 0) + echoed_tokens
+    scaling = content_tokens + output_tokens - fixed
+    load = prompt_tokens - echoed_tokens + output_tokens + int(scaling * (weight - 1))
+
+    decision = {
+        "stage": stage,
+        "domain": domain,
+        "prompt_tokens": prompt_tokens,
+        "output_tokens": output_tokens,
+        "load": load,
+        "echoed_tokens": echoed_tokens,
+        "content_tokens": content_tokens,
+        "skipped": [],
+    }
+
+    if pinned:
+        decision.update(tier="pinned", tier_index=None, model=pinned, reason="model pinned via env")
+        return decision
+
+    stats = model_stats(stage)
+    index = len(TIERS) - 1
+    reason = "no tier large enough, using largest"
+    for i, tier in enumerate(TIERS):
+        if i < min_tier:
+            continue
+        if tier["max_tokens"] < load:
+            decision["skipped"].append(f"{tier['name']}: load {load} > {tier['max_tokens']}")
+            continue
+        issue = _health_issue(stats.get(tier["model"]))
+        if issue and i < len(TIERS) - 1:
+            decision["skipped"].append(f"{tier['name']}: {issue}")
+            continue
+        index = i
+        reason = f"load {load} fits {tier['name']} (max {tier['max_tokens']})"
+        break
+
+    tier = TIERS[index]
+    decision.update(
+        tier=tier["name"],
+        tier_index=index,
+        model=tier["model"],
+        reason=reason,
+        history=stats.get(tier["model"]),
+    )
+    return decision
+
+
+def escalate(decision: Dict[str, Any], prompt: str) -> Dict[str, Any]:
+    """Route a retry one tier above the previous decision."""
+    if decision["tier_index"] is None or decision["tier_index"] >= len(TIERS) - 1:
+        return decision
+    return choose_model(decision["stage"], prompt, decision["domain"],
+                        min_tier=decision["tier_index"] + 1, echoed_tokens=decision["echoed_tokens"],
+                        content_tokens=decision["content_tokens"])
+
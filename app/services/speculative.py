@@ -0,0 +1,185 @@
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Dict, Any, List, Optional, Callable, Tuple
+
+# An answer counts as unchanged only when both sides cover at least this share of each other's keywords.
+MATCH_THRESHOLD = 0.75
+
+STOPWORDS = {
+    "a", "an", "the", "and", "or", "of", "to", "in", "on", "at", "for", "with", "by", "is", "are",
+    "be", "should", "will", "can", "it", "its", "we", "our", "this", "that", "just", "also", "do", "does",
+}
+
+# Any of these in the answer but not in the assumption is read as a contradiction.
+NEGATIONS = {"no", "not", "never", "none", "without", "only", "except", "dont", "doesnt", "cannot", "cant", "wont"}
+
+DEFAULT_ANSWERS = {
+    "scope": "Keep to the scope described in the BRD; anything not mentioned is out of scope for v1.",
+    "actor": "The primary actor is {primary_actor}.",
+    "data": "Capture only the data named in the BRD.",
+    "edge_case": "Show a clear error on failure and let the user retry.",
+    "security": "Role-based access; encrypt sensitive data at rest and in transit.",
+    "kpi": "No KPI target beyond what the BRD states.",
+    "integration": "Integrate with {affected_systems}.",
+    "acceptance": "Accepted when the Gherkin acceptance criteria pass in QA.",
+}
+
+
+def infer_default_answers(questions: List[Dict[str, Any]], meta: Optional[Dict[str, Any]]) -> Dict[str, str]:
+    meta = meta or {}
+    context = {
+        "primary_actor": meta.get("primary_actor") or "the end user",
+        "affected_systems": ", ".join(meta.get("affected_systems") or []) or "existing systems",
+    }
+    return {
+        q["id"]: DEFAULT_ANSWERS.get(q.get("type"), "TBD").format(**context)
+        for q in questions
+    }
+
+
+def infer_key_terms(questions: List[Dict[str, Any]], meta: Optional[Dict[str, Any]]) -> Dict[str, List[str]]:
+    """Values from the clarify meta that an answer must name to agree with its assumption."""
+    meta = meta or {}
+    keys = {}
+    for q in questions:
+        if q.get("type") == "actor" and meta.get("primary_actor"):
+            keys[q["id"]] = [meta["primary_actor"]]
+        elif q.get("type") == "integration" and meta.get("affected_systems"):
+            keys[q["id"]] = list(meta["affected_systems"])
+    return keys
+
+
+def _words(text: str) -> List[str]:
+    return [w.replace("'", "") for w in re.findall(r"[a-z0-9']+", text.lower())]
+
+
+def _keywords(text: str) -> List[str]:
+    return [w for w in _words(text) if w not in STOPWORDS and w not in NEGATIONS]
+
+
+def _negations(text: str) -> set:
+    return {w for w in re.findall(r"[a-z0-9']+", text.lower()) if w.replace("'", "") in NEGATIONS or w.endswith("n't")}
+
+
+def _same_word(a: str, b: str) -> bool:
+    # Cheap stemming: "encrypt"/"encryption", "driver"/"drivers".
+    short, long = sorted((a, b), key=len)
+    return short == long or (len(short) >= 4 and long.startswith(short))
+
+
+def _coverage(words: List[str], against: List[str]) -> float:
+    if not words:
+        return 1.0
+    return sum(1 for w in words if any(_same_word(w, a) for a in against)) / len(words)
+
+
+def answer_matches(assumed: str, answer: str, key_terms: Optional[List[str]] = None) -> bool:
+    """True only when a short or paraphrased answer clearly agrees with the assumed one.
+
+    Errs towards False: a wrong "changed" costs a revise call, a wrong match ships the wrong stories.
+    """
+    words = _keywords(answer)
+    if not words:
+        return not _negations(answer)
+    if _negations(answer) - _negations(assumed):
+        return False
+    expected = _keywords(assumed)
+    if _coverage(words, expected) < MATCH_THRESHOLD:
+        return False
+    if key_terms:
+        # Every meta value the assumption names must be named in the answer too.
+        return all(_coverage(_keywords(term), words) == 1.0 for term in key_terms)
+    return _coverage(expected, words) >= MATCH_THRESHOLD
+
+
+def diff_answers(assumed: Dict[str, str], answers: Dict[str, str],
+                 key_terms: Optional[Dict[str, List[str]]] = None) -> List[str]:
+    """Question ids whose real answer departs from the assumption. Blank answers accept the assumption."""
+    key_terms = key_terms or {}
+    return [
+        qid for qid, answer in answers.items()
+        if (answer or "").strip() and not answer_matches(assumed.get(qid, ""), answer, key_terms.get(qid))
+    ]
+
+
+class SpeculativeDraft:
+    """Drafts stories from assumed answers in the background, then reconciles with the real ones."""
+
+    def __init__(self, brd_text: str, questions: List[Dict[str, Any]], meta: Optional[Dict[str, Any]],
+                 domain: str, generate: Callable, revise: Callable):
+        self.brd_text = brd_text
+        self.domain = domain
+        self.generate = generate
+        self.revise = revise
+        # The draft's basis; user answers never overwrite these.
+        self.assumed = infer_default_answers(questions, meta)
+        self.key_terms = infer_key_terms(questions, meta)
+        # Each job gets its own routes container so a superseded job can't overwrite the one shown.
+        self.draft, self.draft_routes, self.draft_cancel = self._submit(generate, brd_text, self.assumed, domain)
+        self.final: Optional[Future] = None
+        self.final_routes: Dict[str, Any] = {}
+        self.final_cancel: Optional[threading.Event] = None
+        self.mode = "pending"
+        self.changed: List[str] = []
+        # The user's answers, with only blank ones filled from the assumptions.
+        self.answers: Dict[str, str] = dict(self.assumed)
+
+    def _submit(self, fn: Callable, *args) -> Tuple[Future, Dict[str, Any], threading.Event]:
+        # One thread per job: a stale job still finishing its in-flight LLM call never delays a new one.
+        routes: Dict[str, Any] = {}
+        cancel = threading.Event()
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="speculative")
+        future = executor.submit(fn, *args, routes=routes, cancel=cancel)
+        executor.shutdown(wait=False)
+        return future, routes, cancel
+
+    @staticmethod
+    def _stop(name: str, future: Future, cancel: threading.Event):
+        cancel.set()
+        if future.done():
+            return
+        if future.cancel():
+            print(f"[SPECULATIVE] {name} cancelled before it started.")
+        else:
+            print(f"[SPECULATIVE] {name} is mid-call; it stops before its next LLM call and its result is ignored.")
+
+    def resolve(self, answers: Dict[str, str]) -> Future:
+        # A previous resolve for older answers is superseded.
+        if self.final is not None and self.final is not self.draft:
+            self._stop("superseded job", self.final, self.final_cancel)
+
+        self.changed = diff_answers(self.assumed, answers, self.key_terms)
+        self.answers = {
+            qid: (answer or "").strip() or self.assumed.get(qid, "")
+            for qid, answer in answers.items()
+        }
+
+        # A cancelled future is done() but exception() raises CancelledError, so check it first.
+        draft_ok = (
+            not self.draft_cancel.is_set()
+            and not self.draft.cancelled()
+            and (not self.draft.done() or self.draft.exception() is None)
+        )
+        if not self.changed and draft_ok:
+            self.final, self.final_routes, self.final_cancel = self.draft, self.draft_routes, self.draft_cancel
+            self.mode = "speculative"
+        elif self.draft.done() and draft_ok:
+            changed_answers = {qid: self.answers[qid] for qid in self.changed}
+            self.final, self.final_routes, self.final_cancel = self._submit(
+                self.revise, self.brd_text, self.draft.result(), changed_answers, self.domain
+            )
+            self.mode = "revised"
+        else:
+            # Draft is still running, failed, or was stopped by an earlier resolve; don't wait on it.
+            self._stop("stale draft", self.draft, self.draft_cancel)
+            self.final, self.final_routes, self.final_cancel = self._submit(
+                self.generate, self.brd_text, self.answers, self.domain
+            )
+            self.mode = "regenerated"
+        return self.final
+
+    def cancel(self):
+        self._stop("draft", self.draft, self.draft_cancel)
+        if self.final is not None and self.final is not self.draft:
+            self._stop("job", self.final, self.final_cancel)
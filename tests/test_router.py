@@ -0,0 +1,107 @@
+import os
+import json
+import time
+import types
+
+from app.services import router
+
+STORIES_PROMPT = open(
+    os.path.join(os.path.dirname(__file__), "..", "agent", "prompts", "stories.txt"), encoding="utf-8"
+).read()
+
+
+def test_small_brd_routes_to_cheapest_tier(tmp_path, monkeypatch):
+    monkeypatch.setattr(router, "DB_PATH", str(tmp_path / "stats.db"))
+    decision = router.choose_model("clarify", "Add signature capture to PoD app.")
+    assert decision["tier_index"] == 0
+
+
+SAMPLE_ANSWERS = {
+    "fintech_kyc.txt": {
+        "Q1": "Passport, national ID card and driving licence; no utility bills or bank statements in v1. Expired documents are rejected at upload.",
+        "Q2": "New retail customers self-serve on web and mobile; compliance analysts handle manual review. Analysts work from a shared review queue.",
+        "Q3": "Full name, date of birth, address, document number, expiry date and a short selfie video. Address must match the uploaded document.",
+        "Q4": "If the provider times out, queue the check, keep the user signed in and notify them by email. Retries stop after three provider failures.",
+        "Q5": "Documents encrypted at rest and in transit; only compliance analysts can view raw images. Access to raw images is logged for audit.",
+        "Q6": "90% of users auto-verified within 2 minutes; manual reviews closed within one business day. Peak load is about 600 signups per day.",
+        "Q7": "Onfido for document and liveness checks, our core banking API for account creation. Provider webhooks post results back to us.",
+        "Q8": "A verified user can open an account and every approve or reject decision is in the audit log. Documents are retained for seven years.",
+    },
+    "healthcare_appointment.txt": {
+        "Q1": "Outpatient bookings only; telehealth, walk-ins and group sessions are out of scope for v1. Multi-provider clinics share one booking page.",
+        "Q2": "Patients book online; front-desk staff can book, move or cancel on behalf of patients. Clinicians only see their own schedules.",
+        "Q3": "Patient name, phone, email, insurance member ID, preferred clinician and reason for visit. Eligibility results are cached for 24 hours.",
+        "Q4": "If a slot is taken mid-booking, release the hold and offer the next three free slots. Holds expire after ten minutes of inactivity.",
+        "Q5": "HIPAA applies: no diagnosis or clinician notes in SMS or email reminders, ever. Reminder wording is approved by compliance.",
+        "Q6": "No-show rate down 20% within two quarters, measured per clinic against last year. Reported weekly to clinic managers.",
+        "Q7": "Epic for clinician calendars and Availity for real-time insurance eligibility checks. Eligibility failures never block a booking.",
+        "Q8": "Patient receives a confirmation at booking and reminders 24h and 2h before the visit. Patients can cancel from the reminder link.",
+    },
+}
+
+
+def _sample_stories_route(sample: str, domain: str):
+    brd = open(os.path.join(os.path.dirname(__file__), "..", "samples", sample), encoding="utf-8").read()
+    answers_text = json.dumps(SAMPLE_ANSWERS[sample])
+    prompt = STORIES_PROMPT.replace("{BRD_TEXT}", brd).replace("{ANSWERS_JSON}", answers_text)
+    prompt += f"\nDomain context: This is a {domain} domain project. Ensure stories align with {domain} best practices."
+    return router.choose_model("stories", prompt, domain, content_tokens=router.estimate_tokens(brd + answers_text))
+
+
+def test_short_regulated_brds_route_to_cheapest_tier(tmp_path, monkeypatch):
+    monkeypatch.setattr(router, "DB_PATH", str(tmp_path / "stats.db"))
+    assert _sample_stories_route("fintech_kyc.txt", "Fintech")["tier_index"] == 0
+    assert _sample_stories_route("healthcare_appointment.txt", "Healthcare")["tier_index"] == 0
+
+
+def test_revise_is_no_heavier_than_generate(tmp_path, monkeypatch):
+    monkeypatch.setattr(router, "DB_PATH", str(tmp_path / "stats.db"))
+    draft = json.dumps({"epics": [{"name": "KYC", "description": "x" * 4000, "stories": []}], "nfrs": []})
+    decision = router.choose_model("revise", "Revise the draft.\n" + draft, "Fintech",
+                                   echoed_tokens=router.estimate_tokens(draft))
+    assert decision["stage"] == "revise"
+    assert decision["output_tokens"] == router.estimate_tokens(draft)
+    assert decision["tier_index"] == 0
+
+
+def test_large_brd_skips_small_tiers(tmp_path, monkeypatch):
+    monkeypatch.setattr(router, "DB_PATH", str(tmp_path / "stats.db"))
+    decision = router.choose_model("stories", "requirement " * 20000, "Fintech")
+    assert decision["tier_index"] == len(router.TIERS) - 1
+    assert decision["skipped"]
+
+
+def test_unhealthy_model_is_skipped(tmp_path, monkeypatch):
+    monkeypatch.setattr(router, "DB_PATH", str(tmp_path / "stats.db"))
+    cheap = router.TIERS[0]["model"]
+    for _ in range(router.MIN_SAMPLES):
+        router.record_call("stories", cheap, 100, 1.0, False)
+    decision = router.choose_model("stories", "Short BRD")
+    assert decision["model"] != cheap
+
+
+def test_unhealthy_model_is_retried_after_window(tmp_path, monkeypatch):
+    monkeypatch.setattr(router, "DB_PATH", str(tmp_path / "stats.db"))
+    cheap = router.TIERS[0]["model"]
+    for _ in range(router.MIN_SAMPLES):
+        router.record_call("stories", cheap, 100, 1.0, False)
+
+    later = time.time() + router.STATS_WINDOW_S + 1
+    monkeypatch.setattr(router, "time", types.SimpleNamespace(time=lambda: later))
+    assert router.choose_model("stories", "Short BRD")["model"] == cheap
+
+
+def test_escalate_moves_up_one_tier(tmp_path, monkeypatch):
+    monkeypatch.setattr(router, "DB_PATH", str(tmp_path / "stats.db"))
+    decision = router.choose_model("stories", "Short BRD")
+    retry = router.escalate(decision, "Short BRD")
+    assert retry["tier_index"] == decision["tier_index"] + 1
+
+    top = router.choose_model("stories", "Short BRD", min_tier=len(router.TIERS) - 1)
+    assert router.escalate(top, "Short BRD") is top
+
+
+def test_pinned_model_bypasses_routing(tmp_path, monkeypatch):
+    monkeypatch.setattr(router, "DB_PATH", str(tmp_path / "stats.db"))
+    decision = router.choose_model("clarify", "Short BRD", pinned="my/model")
+    assert decision["model"] == "my/model"
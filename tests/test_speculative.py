@@ -0,0 +1,124 @@
+import threading
+from concurrent.futures import Future
+
+from app.services.speculative import SpeculativeDraft, diff_answers, infer_default_answers, infer_key_terms
+
+QUESTIONS = [
+    {"id": "Q1", "type": "scope", "text": "Signature only or photos too?"},
+    {"id": "Q2", "type": "actor", "text": "Who approves PoD?"},
+    {"id": "Q3", "type": "security", "text": "Any PII restrictions?"},
+    {"id": "Q4", "type": "integration", "text": "Systems to integrate?"},
+    {"id": "Q5", "type": "edge_case", "text": "What happens when upload fails?"},
+]
+META = {"domain_guess": "logistics", "primary_actor": "Driver", "affected_systems": ["Mobile", "Backoffice"]}
+
+
+def _generate(brd_text, answers, domain, routes=None, cancel=None):
+    return {"source": "generate", "answers": answers}
+
+
+def _revise(brd_text, draft, changed_answers, domain, routes=None, cancel=None):
+    return {"source": "revise", "draft": draft, "changed": changed_answers}
+
+
+def test_default_answers_use_meta():
+    assumed = infer_default_answers(QUESTIONS, META)
+    assert "Driver" in assumed["Q2"]
+
+
+def test_blank_and_paraphrased_answers_are_unchanged():
+    assumed = infer_default_answers(QUESTIONS, META)
+    keys = infer_key_terms(QUESTIONS, META)
+    answers = {
+        "Q1": "", "Q2": "The driver", "Q4": "Mobile and Backoffice",
+        "Q3": "Role-based access and encryption at rest and in transit",
+    }
+    assert diff_answers(assumed, answers, keys) == []
+    assert diff_answers(assumed, {"Q2": "Driver"}, keys) == []
+
+
+def test_different_answers_are_changed():
+    assumed = infer_default_answers(QUESTIONS, META)
+    keys = infer_key_terms(QUESTIONS, META)
+    answers = {
+        "Q1": "Signature plus photos", "Q2": "Dispatcher approves", "Q3": "Encryption at rest",
+        "Q4": "Backoffice", "Q5": "n/a",
+    }
+    assert diff_answers(assumed, answers, keys) == ["Q1", "Q2", "Q3", "Q4", "Q5"]
+
+
+def test_contradicting_answers_are_changed():
+    assumed = infer_default_answers(QUESTIONS, META)
+    keys = infer_key_terms(QUESTIONS, META)
+    answers = {
+        "Q2": "Not the driver",
+        "Q3": "No encryption needed, no role-based access",
+        "Q4": "Do not integrate with mobile; backoffice only",
+        "Q5": "Do not let the user retry; lock the account on failure",
+    }
+    assert diff_answers(assumed, answers, keys) == ["Q2", "Q3", "Q4", "Q5"]
+    assert diff_answers(assumed, {"Q5": "Don't let the user retry"}, keys) == ["Q5"]
+
+
+def test_matching_answers_reuse_draft():
+    spec = SpeculativeDraft("BRD", QUESTIONS, META, "generic", _generate, _revise)
+    spec.draft.result()
+    result = spec.resolve({"Q1": "", "Q2": "The driver"}).result()
+    assert spec.mode == "speculative"
+    assert result["source"] == "generate"
+
+
+def test_changed_answers_revise_only_affected():
+    spec = SpeculativeDraft("BRD", QUESTIONS, META, "generic", _generate, _revise)
+    spec.draft.result()
+    result = spec.resolve({"Q1": "Photos and GPS stamp required", "Q2": ""}).result()
+    assert spec.mode == "revised"
+    assert list(result["changed"]) == ["Q1"]
+
+
+def test_resolved_answers_keep_user_text():
+    spec = SpeculativeDraft("BRD", QUESTIONS, META, "generic", _generate, _revise)
+    spec.draft.result()
+    spec.resolve({"Q2": "The driver", "Q3": "No encryption needed", "Q5": ""}).result()
+    assert spec.answers["Q2"] == "The driver"
+    assert spec.answers["Q3"] == "No encryption needed"
+    assert spec.answers["Q5"] == spec.assumed["Q5"]
+
+
+def test_resolve_twice_after_cancelled_draft():
+    spec = SpeculativeDraft("BRD", QUESTIONS, META, "generic", _generate, _revise)
+    spec.draft.result()
+    # A draft whose future was cancelled before it started: done() is True but exception() raises.
+    spec.draft = Future()
+    spec.draft.cancel()
+
+    spec.resolve({"Q1": "Photos and GPS stamp required"})
+    assert spec.mode == "regenerated"
+    spec.resolve({"Q1": ""})
+    assert spec.mode == "regenerated"
+    assert spec.final.result()["source"] == "generate"
+
+
+def test_superseded_draft_stops_before_next_llm_call():
+    release = threading.Event()
+    calls = []
+
+    def slow_generate(brd_text, answers, domain, routes=None, cancel=None):
+        release.wait()
+        if cancel.is_set():
+            return None
+        calls.append(answers)
+        return {"source": "generate", "answers": answers}
+
+    spec = SpeculativeDraft("BRD", QUESTIONS, META, "generic", slow_generate, _revise)
+    final = spec.resolve({"Q1": "Photos and GPS stamp required"})
+    assert spec.mode == "regenerated"
+    assert spec.draft_cancel.is_set()
+
+    # A second save supersedes the first regenerate too, without raising.
+    final = spec.resolve({"Q1": "Signature only, no photos"})
+    assert spec.mode == "regenerated"
+    release.set()
+    assert final.result()["answers"]["Q1"] == "Signature only, no photos"
+    assert spec.draft.result() is None
+    assert calls == [final.result()["answers"]]